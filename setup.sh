@@ -23,7 +23,7 @@ source venv/bin/activate
 
 # Install dependencies
 echo "Installing dependencies..."
-pip install solana web3 python-dotenv base58 requests pandas numpy matplotlib
+pip install solana web3 python-dotenv base58 solders requests pyahocorasick orjson pybase64 cachetools pybloom-live uvloop pandas numpy matplotlib
 
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then
@@ -5,37 +5,69 @@ Handles connections to Solana and Base blockchains.
 
 import os
 import logging
-from solana.rpc.api import Client as SolanaClient
+import time
+import math
+import asyncio
+import itertools
+import requests
+from requests.adapters import HTTPAdapter
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Confirmed
 from web3 import Web3
 from dotenv import load_dotenv
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
 from config.config import SOLANA_RPC_URL, BASE_RPC_URL
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Seconds a cached blockhash is handed out for. Blockhashes expire ~150 slots (~60s)
+# after their slot, so this leaves room for the hash's age when fetched and for
+# the transaction to land
+BLOCKHASH_MAX_AGE = 20
+
+class SolanaClientPool:
+    """Round-robin pool of Solana RPC clients so bursts of requests don't queue on one connection."""
+    
+    def __init__(self, rpc_url, pool_size=4):
+        """Create pool_size async clients for the given RPC URL."""
+        self._clients = [AsyncClient(rpc_url) for _ in range(pool_size)]
+        self._rr = itertools.cycle(self._clients)
+        
+    def get(self):
+        """Get the next client in the pool."""
+        return next(self._rr)
+    
+    async def close(self):
+        """Close all clients in the pool."""
+        for client in self._clients:
+            await client.close()
+
 class BlockchainConnection:
     """Class to manage blockchain connections for the trading bot."""
     
     def __init__(self):
         """Initialize blockchain connections."""
         self.solana_client = None
+        self.solana_pool = None
         self.base_client = None
         self.connected_solana = False
         self.connected_base = False
+        self._cached_blockhash = (None, -math.inf)  # (blockhash, monotonic fetch time)
+        self._base_session = None
         
-    def connect_solana(self):
+    async def connect_solana(self):
         """Connect to Solana blockchain."""
         try:
-            self.solana_client = SolanaClient(SOLANA_RPC_URL)
-            # Test connection by getting latest blockhash
-            response = self.solana_client.get_latest_blockhash()
+            # Reuse the pool on reconnect attempts instead of leaking its clients
+            if self.solana_pool is None:
+                self.solana_pool = SolanaClientPool(SOLANA_RPC_URL)
+                self.solana_client = self.solana_pool.get()
+            if not await self.solana_client.is_connected():
+                logger.error("Failed to connect to Solana: Not connected")
+                return False
+            # Seed the blockhash cache while confirming the connection
+            response = await self.solana_client.get_latest_blockhash(commitment=Confirmed)
             if response is not None:
+                self._cached_blockhash = (response.value.blockhash, time.monotonic())
                 self.connected_solana = True
                 logger.info(f"Successfully connected to Solana at {SOLANA_RPC_URL}")
                 return True
@@ -49,7 +81,19 @@ class BlockchainConnection:
     def connect_base(self):
         """Connect to Base blockchain."""
         try:
-            self.base_client = Web3(Web3.HTTPProvider(BASE_RPC_URL))
+            # Reuse pooled keep-alive connections instead of a new TCP/TLS handshake per call;
+            # the session is created once and reused on reconnect attempts
+            if self._base_session is None:
+                self._base_session = requests.Session()
+                self._base_session.headers.update({"Connection": "keep-alive"})
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+                self._base_session.mount("https://", adapter)
+                self._base_session.mount("http://", adapter)
+                self.base_client = Web3(Web3.HTTPProvider(
+                    BASE_RPC_URL,
+                    session=self._base_session,
+                    request_kwargs={"timeout": 5}
+                ))
             if self.base_client.is_connected():
                 self.connected_base = True
                 logger.info(f"Successfully connected to Base at {BASE_RPC_URL}")
@@ -61,24 +105,56 @@ class BlockchainConnection:
             logger.error(f"Failed to connect to Base: {str(e)}")
             return False
     
-    def connect_all(self):
+    async def connect_all(self):
         """Connect to all supported blockchains."""
-        solana_success = self.connect_solana()
+        solana_success = await self.connect_solana()
         base_success = self.connect_base()
         return solana_success, base_success
     
-    def get_solana_client(self):
+    async def get_solana_client(self):
         """Get Solana client instance."""
         if not self.connected_solana:
-            self.connect_solana()
+            await self.connect_solana()
         return self.solana_client
     
+    async def get_solana_pool(self):
+        """Get Solana client pool instance."""
+        if not self.connected_solana:
+            await self.connect_solana()
+        return self.solana_pool
+    
     def get_base_client(self):
         """Get Base client instance."""
         if not self.connected_base:
             self.connect_base()
         return self.base_client
     
+    def get_cached_blockhash(self):
+        """
+        Get the most recently cached Solana blockhash.
+        Returns None if none has been fetched or it is older than BLOCKHASH_MAX_AGE,
+        so callers fall back to fetching a fresh one.
+        """
+        blockhash, fetched_at = self._cached_blockhash
+        if time.monotonic() - fetched_at > BLOCKHASH_MAX_AGE:
+            return None
+        return blockhash
+    
+    async def _blockhash_updater(self, interval=5):
+        """
+        Keep a recent Solana blockhash cached in the background.
+        Lets buy/sell transactions skip the blockhash RPC on the critical path.
+        Runs until the task is cancelled.
+        """
+        while True:
+            try:
+                if self.solana_client is not None:
+                    response = await self.solana_client.get_latest_blockhash(commitment=Confirmed)
+                    self._cached_blockhash = (response.value.blockhash, time.monotonic())
+            except Exception as e:
+                logger.error(f"Failed to refresh cached blockhash: {str(e)}")
+            await asyncio.sleep(interval)
+    
     def check_connections(self):
         """Check if connections are active."""
         solana_status = "Connected" if self.connected_solana else "Disconnected"
@@ -91,6 +167,14 @@ class BlockchainConnection:
 
 # Example usage
 if __name__ == "__main__":
-    connection = BlockchainConnection()
-    solana_success, base_success = connection.connect_all()
-    connection.check_connections()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    async def main():
+        connection = BlockchainConnection()
+        solana_success, base_success = await connection.connect_all()
+        connection.check_connections()
+    
+    asyncio.run(main())
@@ -4,10 +4,11 @@ Integrates all components and manages the overall bot operation.
 """
 
 import logging
+import logging.handlers
+import queue
 import asyncio
 import time
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
+import uvloop
 from src.blockchain_connection import BlockchainConnection
 from src.market_analyzer import MarketAnalyzer
 from src.trading_strategy import TradingStrategy
@@ -15,17 +16,40 @@ from src.transaction_executor import TransactionExecutor
 from src.risk_manager import RiskManager
 from config.config import SOLANA_RPC_URL, MONITORING_INTERVAL
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("fun_bot.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+# Maximum number of new tokens processed concurrently
+MAX_CONCURRENT_TOKENS = 8
+
+# Refresh the wallet balance at least this often (seconds) even when no trades happen
+BALANCE_HEARTBEAT_INTERVAL = 60
+
+def setup_logging():
+    """
+    Configure logging to the console and fun_bot.log.
+    Records are passed through a queue and written by a listener thread, so file
+    and console I/O never blocks the event loop. Returns the started listener.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_handler = logging.FileHandler("fun_bot.log")
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(-1)
+    # The queue handler passes the bare message on; the listener's handlers add the
+    # timestamp, name and level, so records are formatted only once
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+        force=True
+    )
+    
+    listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    return listener
+
 class PumpFunBot:
     """Main controller class for the fun trading bot."""
     
@@ -47,19 +71,28 @@ class PumpFunBot:
         self.running = False
         self.initial_balance = 0
         self.current_balance = 0
+        self._trade_event = asyncio.Event()
+        self._token_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOKENS)
+        # Guards the position-limit check, sizing and reservation so concurrent tokens
+        # can't all pass the limits before any of them reserves its slot and SOL;
+        # the buy RPCs themselves run outside the lock
+        self._buy_lock = asyncio.Lock()
+        self._pending_buys = 0  # Buys reserved but not yet recorded or rolled back
+        self._token_tasks = set()
+        self._blockhash_task = None
         
     async def initialize(self):
         """Initialize all bot components."""
         try:
             # Connect to blockchains
-            solana_success, base_success = self.blockchain_connection.connect_all()
+            solana_success, base_success = await self.blockchain_connection.connect_all()
             
             if not solana_success:
                 logger.error("Failed to connect to Solana blockchain")
                 return False
                 
             # Get Solana client
-            self.solana_client = self.blockchain_connection.get_solana_client()
+            self.solana_client = await self.blockchain_connection.get_solana_client()
             
             # Initialize components
             self.transaction_executor = TransactionExecutor(self.solana_client)
@@ -67,14 +100,14 @@ class PumpFunBot:
             self.current_balance = self.initial_balance
             
             self.trading_strategy = TradingStrategy(self.initial_balance)
-            self.market_analyzer = MarketAnalyzer(self.solana_client)
+            self.market_analyzer = MarketAnalyzer(await self.blockchain_connection.get_solana_pool())
             self.risk_manager = RiskManager(self.trading_strategy, self.transaction_executor)
             
-            logger.info(f"Bot initialized with wallet balance: {self.initial_balance} SOL")
+            logger.info("Bot initialized with wallet balance: %s SOL", self.initial_balance)
             return True
             
         except Exception as e:
-            logger.error(f"Error initializing bot: {str(e)}")
+            logger.error("Error initializing bot: %s", e)
             return False
     
     async def start(self):
@@ -93,6 +126,8 @@ class PumpFunBot:
         # Start monitoring and trading tasks
         monitoring_task = asyncio.create_task(self._monitoring_loop())
         market_task = asyncio.create_task(self._market_monitoring_loop())
+        # The blockhash updater runs until stop() cancels it
+        self._blockhash_task = asyncio.create_task(self.blockchain_connection._blockhash_updater())
         
         # Wait for tasks to complete (they run indefinitely until bot is stopped)
         await asyncio.gather(monitoring_task, market_task)
@@ -107,7 +142,25 @@ class PumpFunBot:
         logger.info("Stopping fun trading bot...")
         
         # Perform cleanup
-        # Close any open connections, etc.
+        if self._blockhash_task is not None:
+            self._blockhash_task.cancel()
+            try:
+                await self._blockhash_task
+            except asyncio.CancelledError:
+                pass
+            self._blockhash_task = None
+            
+        # Cancel tokens still being processed so none reaches a buy after the pool closes
+        token_tasks = list(self._token_tasks)
+        for task in token_tasks:
+            task.cancel()
+        await asyncio.gather(*token_tasks, return_exceptions=True)
+            
+        if self.market_analyzer:
+            await self.market_analyzer.close()
+            
+        if self.blockchain_connection.solana_pool:
+            await self.blockchain_connection.solana_pool.close()
         
         logger.info("Bot stopped")
     
@@ -115,14 +168,23 @@ class PumpFunBot:
         """Main monitoring loop for portfolio management."""
         logger.info("Starting monitoring loop...")
         
+        last_balance_update = float("-inf")
+        
         while self.running:
             try:
-                # Update wallet balance
-                self.current_balance = await self.transaction_executor.get_wallet_balance()
-                self.trading_strategy.set_wallet_balance(self.current_balance)
+                # Consume any pending trade notification
+                trade_changed = self._trade_event.is_set()
+                self._trade_event.clear()
                 
-                # Check wallet health
-                self.risk_manager.check_wallet_health(self.initial_balance, self.current_balance)
+                # Update wallet balance only after a trade or on the heartbeat
+                now = time.monotonic()
+                if trade_changed or now - last_balance_update >= BALANCE_HEARTBEAT_INTERVAL:
+                    self.current_balance = await self.transaction_executor.get_wallet_balance()
+                    self.trading_strategy.set_wallet_balance(self.current_balance)
+                    last_balance_update = now
+                    
+                    # Check wallet health
+                    self.risk_manager.check_wallet_health(self.initial_balance, self.current_balance)
                 
                 # Monitor active trades for stop loss/take profit
                 tokens_to_sell = await self.risk_manager.monitor_active_trades()
@@ -131,17 +193,21 @@ class PumpFunBot:
                 for token_address in tokens_to_sell:
                     await self._sell_token(token_address)
                 
-                # Calculate and log performance
-                performance = self.trading_strategy.calculate_performance()
-                if performance["total_trades"] > 0:
-                    logger.info(f"Performance: {performance['profitable_trades']}/{performance['total_trades']} profitable trades ({performance['win_rate']:.2%})")
-                    logger.info(f"Total P/L: {performance['total_profit_loss']:.2%}")
+                # Calculate and log performance (it only changes when trades do)
+                if trade_changed:
+                    performance = self.trading_strategy.calculate_performance()
+                    if performance["total_trades"] > 0:
+                        logger.info("Performance: %s/%s profitable trades (%.2f%%)", performance['profitable_trades'], performance['total_trades'], performance['win_rate'] * 100)
+                        logger.info("Total P/L: %.2f%%", performance['total_profit_loss'] * 100)
                 
-                # Sleep for monitoring interval
-                await asyncio.sleep(MONITORING_INTERVAL)
+                # Sleep until the next trade or the monitoring interval, whichever comes first
+                try:
+                    await asyncio.wait_for(self._trade_event.wait(), timeout=MONITORING_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
                 
             except Exception as e:
-                logger.error(f"Error in monitoring loop: {str(e)}")
+                logger.error("Error in monitoring loop: %s", e)
                 await asyncio.sleep(10)  # Sleep and retry
     
     async def _market_monitoring_loop(self):
@@ -162,52 +228,75 @@ class PumpFunBot:
                 await asyncio.sleep(60)
                 
                 # Example token data (in a real implementation, this would come from the market_analyzer)
+                timestamp = time.monotonic_ns()
                 token_data = {
-                    "mint": f"simulated_token_{int(time.time())}",
+                    "mint": f"simulated_token_{timestamp}",
                     "name": "Simulated Token",
                     "symbol": "SIM",
                     "bondingCurve": "simulated_bonding_curve",
                     "associatedBondingCurve": "simulated_associated_bonding_curve",
                     "creator": "simulated_creator",
-                    "timestamp": time.time()
+                    "timestamp": timestamp
                 }
                 
-                # Process the new token
-                await self._process_new_token(token_data)
+                # Process the new token without blocking detection of the next one
+                task = asyncio.create_task(self._process_new_token_guarded(token_data))
+                self._token_tasks.add(task)
+                task.add_done_callback(self._token_tasks.discard)
                 
             except Exception as e:
-                logger.error(f"Error in market monitoring loop: {str(e)}")
+                logger.error("Error in market monitoring loop: %s", e)
                 await asyncio.sleep(10)  # Sleep and retry
     
+    async def _process_new_token_guarded(self, token_data):
+        """Process a new token, limited to MAX_CONCURRENT_TOKENS at a time."""
+        async with self._token_semaphore:
+            await self._process_new_token(token_data)
+    
     async def _process_new_token(self, token_data):
         """Process a new token and decide whether to buy it."""
         try:
-            logger.info(f"Processing new token: {token_data['name']} ({token_data['symbol']})")
+            logger.info("Processing new token: %s (%s)", token_data['name'], token_data['symbol'])
             
             # Analyze token
             success, token_data, score = await self._analyze_token(token_data)
             
             if not success:
-                logger.info(f"Token analysis failed or token does not meet criteria: {token_data['symbol']}")
+                logger.info("Token analysis failed or token does not meet criteria: %s", token_data['symbol'])
                 return
                 
             # Perform safety checks
             if not await self.risk_manager.perform_safety_checks(token_data):
-                logger.warning(f"Token failed safety checks: {token_data['symbol']}")
+                logger.warning("Token failed safety checks: %s", token_data['symbol'])
                 return
                 
-            # Decide whether to buy
-            should_buy, sol_amount, reason = self.trading_strategy.should_buy(token_data, score)
-            
-            if not should_buy:
-                logger.info(f"Decision not to buy token: {token_data['symbol']} - {reason}")
-                return
+            async with self._buy_lock:
+                # Re-check the position limit, counting buys still in flight
+                if not self.risk_manager.check_portfolio_diversification(self._pending_buys):
+                    logger.warning("Failed portfolio diversification check: %s", token_data['symbol'])
+                    return
+                    
+                # Decide whether to buy (sized against the balance not already reserved)
+                should_buy, sol_amount, reason = self.trading_strategy.should_buy(token_data, score)
+                
+                if not should_buy:
+                    logger.info("Decision not to buy token: %s - %s", token_data['symbol'], reason)
+                    return
+                    
+                # Reserve the position slot and SOL before releasing the lock
+                self._pending_buys += 1
+                self.trading_strategy.reserve_balance(sol_amount)
                 
-            # Buy token
-            await self._buy_token(token_data, sol_amount)
+            # Buy token; the reservation is released whether or not the buy succeeds,
+            # since a successful buy is recorded as an active trade before this returns
+            try:
+                await self._buy_token(token_data, sol_amount)
+            finally:
+                self._pending_buys -= 1
+                self.trading_strategy.release_balance(sol_amount)
             
         except Exception as e:
-            logger.error(f"Error processing new token: {str(e)}")
+            logger.error("Error processing new token: %s", e)
     
     async def _analyze_token(self, token_data):
         """Analyze a token to determine if it's a good trading opportunity."""
@@ -219,65 +308,75 @@ class PumpFunBot:
         
         # Determine if this is a good trading opportunity
         if score >= 70:  # Threshold for "good" opportunity
-            logger.info(f"High potential token detected: {token_data['name']} (Score: {score})")
+            logger.info("High potential token detected: %s (Score: %s)", token_data['name'], score)
             return True, token_data, score
         else:
-            logger.info(f"Token does not meet criteria: {token_data['name']} (Score: {score})")
+            logger.info("Token does not meet criteria: %s (Score: %s)", token_data['name'], score)
             return False, token_data, score
     
     async def _buy_token(self, token_data, sol_amount):
         """Buy a token."""
         try:
-            logger.info(f"Buying {sol_amount} SOL of {token_data['symbol']}")
+            logger.info("Buying %s SOL of %s", sol_amount, token_data['symbol'])
             
-            # Execute buy transaction
-            success, tx_id, price = await self.transaction_executor.buy_token(token_data, sol_amount)
+            # Execute buy transaction using the cached blockhash
+            success, tx_id, price = await self.transaction_executor.buy_token(
+                token_data,
+                sol_amount,
+                recent_blockhash=self.blockchain_connection.get_cached_blockhash()
+            )
             
             if not success:
-                logger.error(f"Failed to buy token: {token_data['symbol']}")
+                logger.error("Failed to buy token: %s", token_data['symbol'])
                 return
                 
-            # Record buy in trading strategy
+            # Record buy in trading strategy and wake the monitoring loop
             self.trading_strategy.record_buy(token_data, sol_amount, price)
+            # Deduct the spent SOL so the next buy is sized against what is left; the
+            # monitoring loop replaces this with the on-chain balance on its next pass
+            self.trading_strategy.set_wallet_balance(self.trading_strategy.wallet_balance - sol_amount)
+            self._trade_event.set()
             
-            logger.info(f"Successfully bought {sol_amount} SOL of {token_data['symbol']} at {price} SOL per token")
-            logger.info(f"Transaction ID: {tx_id}")
+            logger.info("Successfully bought %s SOL of %s at %s SOL per token", sol_amount, token_data['symbol'], price)
+            logger.info("Transaction ID: %s", tx_id)
             
         except Exception as e:
-            logger.error(f"Error buying token: {str(e)}")
+            logger.error("Error buying token: %s", e)
     
     async def _sell_token(self, token_address):
         """Sell a token."""
         try:
-            # Get token data from active trades
+            # Get trade record from active trades
             active_trades = self.trading_strategy.get_active_trades()
             
             if token_address not in active_trades:
-                logger.error(f"Token not found in active trades: {token_address}")
+                logger.error("Token not found in active trades: %s", token_address)
                 return
                 
-            token_data = active_trades[token_address]
+            trade = active_trades[token_address]
             
-            logger.info(f"Selling token: {token_data['token_symbol']}")
+            logger.info("Selling token: %s", trade.token_symbol)
             
-            # Execute sell transaction
+            # Execute sell transaction using the cached blockhash
             success, tx_id, price = await self.transaction_executor.sell_token(
                 token_address, 
-                token_data["bondingCurve"]
+                trade.bonding_curve,
+                recent_blockhash=self.blockchain_connection.get_cached_blockhash()
             )
             
             if not success:
-                logger.error(f"Failed to sell token: {token_data['token_symbol']}")
+                logger.error("Failed to sell token: %s", trade.token_symbol)
                 return
                 
-            # Record sell in trading strategy
-            self.trading_strategy.record_sell(token_address, token_data["sol_amount"], price)
+            # Record sell in trading strategy and wake the monitoring loop
+            self.trading_strategy.record_sell(token_address, trade.sol_amount, price)
+            self._trade_event.set()
             
-            logger.info(f"Successfully sold {token_data['token_symbol']} at {price} SOL per token")
-            logger.info(f"Transaction ID: {tx_id}")
+            logger.info("Successfully sold %s at %s SOL per token", trade.token_symbol, price)
+            logger.info("Transaction ID: %s", tx_id)
             
         except Exception as e:
-            logger.error(f"Error selling token: {str(e)}")
+            logger.error("Error selling token: %s", e)
 
 # Example usage
 if __name__ == "__main__":
@@ -289,4 +388,9 @@ if __name__ == "__main__":
             logger.info("Keyboard interrupt received, stopping bot...")
             await bot.stop()
     
-    asyncio.run(main())
+    log_listener = setup_logging()
+    try:
+        # Run on the libuv-based event loop for higher socket throughput
+        uvloop.run(main())
+    finally:
+        log_listener.stop()
@@ -5,35 +5,164 @@ Monitors for new token creations and analyzes trading opportunities.
 
 import logging
 import time
-import json
-from solana.rpc.api import Client as SolanaClient
+import asyncio
+import hashlib
+import heapq
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+import orjson
+import pybase64
+import ahocorasick
+from cachetools import TTLCache
 from solana.rpc.websocket_api import connect
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from solders.commitment_config import CommitmentLevel
+from solders.rpc.config import RpcTransactionConfig
+from solders.rpc.requests import GetTransaction
+from solders.transaction_status import UiTransactionEncoding
+from solders.transaction import VersionedTransaction
 from config.config import fun_PROGRAM_ID, SOLANA_RPC_URL, BLACKLISTED_TERMS, COOLDOWN_PERIOD
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Common meme patterns that tend to perform well (lowercase)
+MEME_PATTERNS = ("dog", "cat", "pepe", "elon", "moon", "rocket", "inu", "shib")
+
+# Blacklisted terms lowercased once at import
+BLACKLISTED_TERMS_LOWER = tuple(term.lower() for term in BLACKLISTED_TERMS if term)
+
+# Cooldown before scoring a new token, in monotonic nanoseconds
+COOLDOWN_PERIOD_NS = int(COOLDOWN_PERIOD * 1_000_000_000)
+
+# Anchor instruction discriminator for the program's create instruction
+CREATE_DISCRIMINATOR = hashlib.sha256(b"global:create").digest()[:8]
+
+# Maximum number of recently seen transaction signatures kept for deduplication
+MAX_SEEN_SIGNATURES = 2 ** 15
+
+# Separates name and symbol in the automaton haystack so no term can match across both
+NAME_SYMBOL_SEPARATOR = "\x00"
+
+# getTransaction options for batched lookups: raw base64 transactions, v0 included
+TRANSACTION_CONFIG = RpcTransactionConfig(
+    encoding=UiTransactionEncoding.Base64,
+    commitment=CommitmentLevel.Confirmed,
+    max_supported_transaction_version=0
+)
+
+@dataclass(slots=True)
+class TokenRecord:
+    """Compact record of a monitored token."""
+    mint: str
+    name: str
+    symbol: str
+    bonding_curve: str
+    associated_bonding_curve: str
+    creator: str
+    timestamp: int  # time.monotonic_ns() at detection
+    
+    @classmethod
+    def from_token_data(cls, token_data):
+        """Build a record from a token data dictionary."""
+        return cls(
+            mint=token_data["mint"],
+            name=token_data["name"],
+            symbol=token_data["symbol"],
+            bonding_curve=token_data["bondingCurve"],
+            associated_bonding_curve=token_data["associatedBondingCurve"],
+            creator=token_data["creator"],
+            timestamp=token_data["timestamp"]
+        )
+
 class MarketAnalyzer:
     """Class to monitor and analyze fun market for trading opportunities."""
     
-    def __init__(self, solana_client):
-        """Initialize market analyzer with Solana client."""
-        self.solana_client = solana_client
+    def __init__(self, solana_pool):
+        """Initialize market analyzer with a Solana client pool."""
+        self.solana_pool = solana_pool
+        self.program_id = Pubkey.from_string(fun_PROGRAM_ID)
         self.monitored_tokens = {}
-        self.blacklisted_terms = BLACKLISTED_TERMS
+        self.blacklisted_terms = BLACKLISTED_TERMS_LOWER
+        self.max_batch_size = 32
+        self._signature_queue = asyncio.Queue()
+        self._batch_semaphore = asyncio.Semaphore(32)  # Limit concurrent batch RPCs
+        self._batch_tasks = set()
+        self._pending_scores = []  # Heap of (deadline_ns, sequence, token_data)
+        self._pending_sequence = itertools.count()
+        self._pending_event = asyncio.Event()
+        self._scoring_tasks = set()
+        self._term_automaton = self._build_term_automaton()
+        self._seen_signatures = OrderedDict()
+        self._creator_rep_cache = TTLCache(maxsize=4096, ttl=300)
+        self._liquidity_cache = TTLCache(maxsize=4096, ttl=300)
+        
+    async def close(self):
+        """
+        Cancel in-flight batch and scoring tasks.
+        The client pool is owned by the caller and is not closed here.
+        """
+        tasks = self._batch_tasks | self._scoring_tasks
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+    def _build_term_automaton(self):
+        """
+        Compile blacklisted terms and meme patterns into one Aho-Corasick automaton.
+        Lets a single pass over a token's name and symbol find every matching term.
+        """
+        # Map each lowercased term to (is_blacklisted, is_meme) so overlapping lists both count
+        terms = {term: (True, False) for term in self.blacklisted_terms}
+        for pattern in MEME_PATTERNS:
+            is_blacklisted, _ = terms.get(pattern, (False, False))
+            terms[pattern] = (is_blacklisted, True)
+        
+        automaton = ahocorasick.Automaton()
+        for term, (is_blacklisted, is_meme) in terms.items():
+            automaton.add_word(term, (term, is_blacklisted, is_meme))
+        automaton.make_automaton()
+        return automaton
+    
+    def _match_terms(self, name, symbol):
+        """
+        Scan name and symbol once for blacklisted terms and meme patterns.
+        Returns a tuple of (blacklisted_term, meme_patterns). Blacklisted terms are
+        only matched against the name; meme patterns match either field.
+        """
+        name_lower = name.lower()
+        haystack = name_lower + NAME_SYMBOL_SEPARATOR + symbol.lower()
+        
+        blacklisted_term = None
+        meme_patterns = set()
+        for end_index, (term, is_blacklisted, is_meme) in self._term_automaton.iter(haystack):
+            if is_meme:
+                meme_patterns.add(term)
+            if is_blacklisted and blacklisted_term is None and end_index < len(name_lower):
+                blacklisted_term = term
+        
+        return blacklisted_term, meme_patterns
+    
+    def _is_duplicate_signature(self, signature):
+        """
+        Check whether a transaction signature has already been seen.
+        Records the signature, evicting the oldest once MAX_SEEN_SIGNATURES is exceeded.
+        """
+        if signature in self._seen_signatures:
+            return True
+        
+        self._seen_signatures[signature] = None
+        if len(self._seen_signatures) > MAX_SEEN_SIGNATURES:
+            self._seen_signatures.popitem(last=False)
+        return False
         
     async def monitor_new_tokens(self):
         """
         Monitor for new token creations on fun.
         Uses Solana websocket subscription to listen for program transactions.
         """
-        logger.info(f"Starting to monitor for new tokens on fun (Program ID: {fun_PROGRAM_ID})")
+        logger.info("Starting to monitor for new tokens on fun (Program ID: %s)", fun_PROGRAM_ID)
         
         async with connect(SOLANA_RPC_URL) as websocket:
             await websocket.logs_subscribe(
@@ -42,62 +171,123 @@ class MarketAnalyzer:
             )
             
             first_resp = await websocket.recv()
-            subscription_id = first_resp.result
+            subscription_id = first_resp[0].result
             
-            logger.info(f"Successfully subscribed to fun program logs (Subscription ID: {subscription_id})")
+            logger.info("Successfully subscribed to fun program logs (Subscription ID: %s)", subscription_id)
             
-            while True:
-                try:
-                    msg = await websocket.recv()
-                    if msg.result is not None and hasattr(msg.result, 'value'):
-                        transaction = msg.result.value
-                        await self._process_transaction(transaction)
-                except Exception as e:
-                    logger.error(f"Error processing transaction: {str(e)}")
-    
-    async def _process_transaction(self, transaction):
-        """Process a transaction to extract token creation data."""
-        try:
-            # Extract transaction signature
-            signature = transaction.signature
-            
-            # Get transaction details
-            tx_details = await self.solana_client.get_transaction(
-                signature, 
-                encoding="jsonParsed"
-            )
+            # Transaction details are fetched in batches by a separate consumer
+            consumer_task = asyncio.create_task(self._transaction_batch_consumer())
+            scheduler_task = asyncio.create_task(self._scoring_scheduler())
             
+            try:
+                while True:
+                    try:
+                        # Each frame may carry several notifications; queue them all before awaiting again
+                        messages = await websocket.recv()
+                        for msg in messages:
+                            if msg.result is not None and hasattr(msg.result, 'value'):
+                                transaction = msg.result.value
+                                signature = str(transaction.signature)
+                                # The websocket can deliver the same transaction more than once
+                                if not self._is_duplicate_signature(signature):
+                                    self._signature_queue.put_nowait(signature)
+                    except Exception as e:
+                        logger.error("Error processing transaction: %s", e)
+            finally:
+                consumer_task.cancel()
+                scheduler_task.cancel()
+    
+    async def _transaction_batch_consumer(self):
+        """
+        Consume queued transaction signatures and fetch their details in batches.
+        Batches are processed concurrently; while all slots are busy, new signatures
+        accumulate in the queue and are coalesced into larger batches.
+        """
+        while True:
+            signatures = [await self._signature_queue.get()]
+            await self._batch_semaphore.acquire()
+            while not self._signature_queue.empty() and len(signatures) < self.max_batch_size:
+                signatures.append(self._signature_queue.get_nowait())
+                
+            task = asyncio.create_task(self._process_transaction_batch(signatures))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._on_batch_done)
+    
+    def _on_batch_done(self, task):
+        """Release the batch slot held by a finished batch task."""
+        self._batch_tasks.discard(task)
+        self._batch_semaphore.release()
+    
+    async def _process_transaction_batch(self, signatures):
+        """Fetch and analyze a batch of transactions."""
+        try:
+            results = await self._fetch_transactions_batch(signatures)
+            await asyncio.gather(*(self._handle_transaction_details(tx_details) for tx_details in results))
+        except Exception as e:
+            logger.error("Error processing transaction batch of %s: %s", len(signatures), e)
+    
+    async def _fetch_transactions_batch(self, signatures):
+        """
+        Fetch details for several transactions with a single JSON-RPC batch request.
+        Returns a list of responses in the same order as signatures.
+        """
+        batch = tuple(
+            GetTransaction(Signature.from_string(signature), TRANSACTION_CONFIG, id=i)
+            for i, signature in enumerate(signatures)
+        )
+        # Sent through a pooled client's provider, which raises on HTTP errors; the raw
+        # body is kept as dicts for the parsing below
+        raw_response = await self.solana_pool.get()._provider.make_batch_request_unparsed(batch)
+        return self._parse_batch_response(raw_response)
+    
+    @staticmethod
+    def _parse_batch_response(content):
+        """Parse a JSON-RPC batch response body into a list ordered by request id."""
+        # Batch responses are not guaranteed to come back in request order
+        return sorted(orjson.loads(content), key=lambda r: r.get("id", 0))
+    
+    async def _handle_transaction_details(self, tx_details):
+        """Analyze a fetched transaction if it is a token creation."""
+        try:
             # Check if this is a token creation transaction
             if self._is_token_creation(tx_details):
                 token_data = self._extract_token_data(tx_details)
                 if token_data:
                     await self._analyze_token(token_data)
         except Exception as e:
-            logger.error(f"Error processing transaction {signature if 'signature' in locals() else 'unknown'}: {str(e)}")
+            logger.error("Error handling transaction details: %s", e)
+    
+    def _decode_transaction(self, tx_details):
+        """
+        Decode the base64-encoded transaction from a getTransaction response.
+        Returns a VersionedTransaction, or None if the response has no transaction.
+        """
+        if not tx_details or not tx_details.get("result"):
+            return None
+            
+        encoded_tx, _encoding = tx_details["result"]["transaction"]
+        return VersionedTransaction.from_bytes(pybase64.b64decode(encoded_tx, validate=False))
     
     def _is_token_creation(self, tx_details):
         """
         Determine if a transaction is a token creation on fun.
-        Looks for specific instruction signatures in the transaction.
+        Looks for an instruction to the program whose data starts with the create discriminator.
         """
         try:
-            if not tx_details or not tx_details.get("result"):
+            transaction = self._decode_transaction(tx_details)
+            if transaction is None:
                 return False
                 
-            # Check for the create instruction discriminator
-            # This would need to be updated with the actual discriminator for token creation
-            instructions = tx_details["result"]["transaction"]["message"]["instructions"]
-            for instruction in instructions:
-                if instruction.get("programId") == fun_PROGRAM_ID:
-                    # Check for create instruction data pattern
-                    # This is a simplified check and would need to be refined based on actual data format
-                    data = instruction.get("data")
-                    if data and data.startswith("create"):
-                        return True
+            # Program IDs are always static account keys, even in v0 transactions
+            account_keys = transaction.message.account_keys
+            for instruction in transaction.message.instructions:
+                if (account_keys[instruction.program_id_index] == self.program_id
+                        and instruction.data[:8] == CREATE_DISCRIMINATOR):
+                    return True
             
             return False
         except Exception as e:
-            logger.error(f"Error checking if transaction is token creation: {str(e)}")
+            logger.error("Error checking if transaction is token creation: %s", e)
             return False
     
     def _extract_token_data(self, tx_details):
@@ -122,52 +312,89 @@ class MarketAnalyzer:
                 "name": "token_name",
                 "symbol": "token_symbol",
                 "creator": "creator_address",
-                "timestamp": time.time()
+                "timestamp": time.monotonic_ns()
             }
             
             return token_data
         except Exception as e:
-            logger.error(f"Error extracting token data: {str(e)}")
+            logger.error("Error extracting token data: %s", e)
             return None
     
     async def _analyze_token(self, token_data):
         """
         Analyze a new token to determine if it's a good trading opportunity.
-        Implements filtering and scoring based on various criteria.
+        Filters out blacklisted tokens and schedules the rest for scoring
+        after COOLDOWN_PERIOD.
         """
         try:
             # Skip tokens with blacklisted terms in name
-            if any(term.lower() in token_data["name"].lower() for term in self.blacklisted_terms):
-                logger.info(f"Skipping token with blacklisted term: {token_data['name']}")
+            blacklisted_term, _ = self._match_terms(token_data["name"], token_data["symbol"])
+            if blacklisted_term is not None:
+                logger.info("Skipping token with blacklisted term: %s", token_data['name'])
                 return
             
             # Add token to monitored list
-            self.monitored_tokens[token_data["mint"]] = token_data
+            self.monitored_tokens[token_data["mint"]] = TokenRecord.from_token_data(token_data)
             
             # Log the new token
-            logger.info(f"New token detected: {token_data['name']} ({token_data['symbol']})")
-            logger.info(f"Mint address: {token_data['mint']}")
+            logger.info("New token detected: %s (%s)", token_data['name'], token_data['symbol'])
+            logger.info("Mint address: %s", token_data['mint'])
             
-            # Wait for cooldown period before analyzing further
+            # Schedule deeper analysis after the cooldown period
             # This allows the token to stabilize and gather initial trading data
-            logger.info(f"Waiting {COOLDOWN_PERIOD} seconds for token to stabilize...")
-            import asyncio
-            await asyncio.sleep(COOLDOWN_PERIOD)
-            
+            logger.info("Scoring token in %s seconds once it stabilizes...", COOLDOWN_PERIOD)
+            deadline_ns = token_data["timestamp"] + COOLDOWN_PERIOD_NS
+            heapq.heappush(self._pending_scores, (deadline_ns, next(self._pending_sequence), token_data))
+            self._pending_event.set()
+                
+        except Exception as e:
+            logger.error("Error analyzing token: %s", e)
+    
+    async def _scoring_scheduler(self):
+        """
+        Score pending tokens once their cooldown deadline passes.
+        A single timer task replaces one sleeping coroutine per token.
+        """
+        while True:
+            self._pending_event.clear()
+            if not self._pending_scores:
+                await self._pending_event.wait()
+                continue
+                
+            delay = (self._pending_scores[0][0] - time.monotonic_ns()) / 1_000_000_000
+            if delay > 0:
+                # Wake early if a token with an earlier deadline is scheduled
+                try:
+                    await asyncio.wait_for(self._pending_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+                
+            _, _, token_data = heapq.heappop(self._pending_scores)
+            task = asyncio.create_task(self._evaluate_opportunity(token_data))
+            self._scoring_tasks.add(task)
+            task.add_done_callback(self._scoring_tasks.discard)
+    
+    async def _evaluate_opportunity(self, token_data):
+        """
+        Score a token whose cooldown has elapsed and decide if it's a good opportunity.
+        Returns a tuple of (is_opportunity, token_data, score).
+        """
+        try:
             # Perform deeper analysis
             score = await self._score_token(token_data)
             
             # Determine if this is a good trading opportunity
             if score >= 70:  # Threshold for "good" opportunity
-                logger.info(f"High potential token detected: {token_data['name']} (Score: {score})")
+                logger.info("High potential token detected: %s (Score: %s)", token_data['name'], score)
                 # Signal to trading module that this is a good opportunity
                 return True, token_data, score
             else:
-                logger.info(f"Token does not meet criteria: {token_data['name']} (Score: {score})")
+                logger.info("Token does not meet criteria: %s (Score: %s)", token_data['name'], score)
                 return False, token_data, score
                 
         except Exception as e:
-            logger.error(f"Error analyzing token: {str(e)}")
+            logger.error("Error evaluating token: %s", e)
             return False, token_data, 0
     
     async def _score_token(self, token_data):
@@ -197,20 +424,33 @@ class MarketAnalyzer:
             return min(round(score), 100)  # Cap at 100
             
         except Exception as e:
-            logger.error(f"Error scoring token: {str(e)}")
+            logger.error("Error scoring token: %s", e)
             return 0
     
     async def _check_creator_reputation(self, creator_address):
         """Check reputation of token creator based on past tokens."""
+        if creator_address in self._creator_rep_cache:
+            return self._creator_rep_cache[creator_address]
+            
         # This would query historical data to see if this creator has launched successful tokens before
-        # For now, return a placeholder score
-        return 50  # Neutral score for unknown creators
+        # For now, use a placeholder score
+        score = 50  # Neutral score for unknown creators
+        
+        self._creator_rep_cache[creator_address] = score
+        return score
     
     async def _check_initial_liquidity(self, bonding_curve_address):
         """Check initial liquidity provided for the token."""
-        # This would query the bonding curve account to determine initial liquidity
-        # For now, return a placeholder score
-        return 60  # Slightly above average liquidity
+        if bonding_curve_address in self._liquidity_cache:
+            return self._liquidity_cache[bonding_curve_address]
+            
+        # This would query the bonding curve account to determine initial liquidity,
+        # e.g. via self.solana_pool.get().get_account_info(bonding_curve_address)
+        # For now, use a placeholder score
+        score = 60  # Slightly above average liquidity
+        
+        self._liquidity_cache[bonding_curve_address] = score
+        return score
     
     def _evaluate_token_name(self, name, symbol):
         """Evaluate token name and symbol for quality and appeal."""
@@ -218,13 +458,8 @@ class MarketAnalyzer:
         length_score = min(len(name) / 20 * 100, 100)
         
         # Check for common meme patterns that tend to perform well
-        meme_patterns = ["dog", "cat", "pepe", "elon", "moon", "rocket", "inu", "shib"]
-        meme_score = 0
-        for pattern in meme_patterns:
-            if pattern.lower() in name.lower() or pattern.lower() in symbol.lower():
-                meme_score += 20
-        
-        meme_score = min(meme_score, 100)
+        _, meme_patterns = self._match_terms(name, symbol)
+        meme_score = min(len(meme_patterns) * 20, 100)
         
         # Combine scores with weights
         return length_score * 0.4 + meme_score * 0.6
@@ -237,11 +472,20 @@ class MarketAnalyzer:
 
 # Example usage
 if __name__ == "__main__":
-    import asyncio
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    from src.blockchain_connection import SolanaClientPool
     
     async def main():
-        solana_client = SolanaClient(SOLANA_RPC_URL)
-        analyzer = MarketAnalyzer(solana_client)
-        await analyzer.monitor_new_tokens()
+        solana_pool = SolanaClientPool(SOLANA_RPC_URL)
+        analyzer = MarketAnalyzer(solana_pool)
+        try:
+            await analyzer.monitor_new_tokens()
+        finally:
+            await analyzer.close()
+            await solana_pool.close()
     
     asyncio.run(main())
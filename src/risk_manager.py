@@ -4,25 +4,27 @@ Implements safeguards and monitoring to prevent losses.
 """
 
 import logging
+import re
 import time
 import asyncio
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
+import numpy as np
+from pybloom_live import ScalableBloomFilter
 from config.config import (
     MAX_TOKENS_HELD, MINIMUM_LIQUIDITY, 
     STOP_LOSS_PERCENTAGE, TAKE_PROFIT_PERCENTAGE
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Fields every token must have before it can be traded
+REQUIRED_TOKEN_FIELDS = ("mint", "bondingCurve", "associatedBondingCurve", "name", "symbol", "creator")
+
 class RiskManager:
     """Class to manage risk and prevent losses in the trading bot."""
     
+    # Suspicious words in token names/symbols, matched case-insensitively in one pass
+    _SUSPICIOUS_RE = re.compile(r"scam|rug|fake|steal|ponzi", re.IGNORECASE)
+    
     def __init__(self, trading_strategy=None, transaction_executor=None):
         """Initialize risk manager with trading strategy and transaction executor."""
         self.trading_strategy = trading_strategy
@@ -32,7 +34,9 @@ class RiskManager:
         self.stop_loss = STOP_LOSS_PERCENTAGE
         self.take_profit = TAKE_PROFIT_PERCENTAGE
         self.emergency_stop = False
-        self.suspicious_tokens = set()
+        # Bloom filter keeps memory flat as the scammer list grows; no false negatives,
+        # and the rare false positive only means skipping a token
+        self.suspicious_tokens = ScalableBloomFilter(initial_capacity=100_000, error_rate=0.001)
         
     def set_trading_strategy(self, trading_strategy):
         """Set trading strategy reference."""
@@ -42,20 +46,21 @@ class RiskManager:
         """Set transaction executor reference."""
         self.transaction_executor = transaction_executor
         
-    def check_portfolio_diversification(self):
+    def check_portfolio_diversification(self, pending_buys=0):
         """
         Check if portfolio is properly diversified.
+        pending_buys counts buys in flight that are not yet active trades.
         Returns True if diversification is acceptable, False otherwise.
         """
         if not self.trading_strategy:
             logger.error("Trading strategy not set")
             return False
             
-        active_trades = self.trading_strategy.get_active_trades()
+        tokens_held = len(self.trading_strategy.get_active_trades()) + pending_buys
         
         # Check number of tokens held
-        if len(active_trades) >= self.max_tokens:
-            logger.warning(f"Maximum number of tokens held: {len(active_trades)}/{self.max_tokens}")
+        if tokens_held >= self.max_tokens:
+            logger.warning(f"Maximum number of tokens held: {tokens_held}/{self.max_tokens}")
             return False
             
         return True
@@ -90,7 +95,7 @@ class RiskManager:
         Returns True if creator is acceptable, False otherwise.
         """
         # This would check against a database of known scammers
-        # For now, use a simple check against suspicious_tokens set
+        # For now, use a simple check against the suspicious_tokens filter
         if creator_address in self.suspicious_tokens:
             logger.warning(f"Suspicious creator detected: {creator_address}")
             return False
@@ -103,18 +108,16 @@ class RiskManager:
         Returns True if token data is acceptable, False otherwise.
         """
         # Check for missing fields
-        required_fields = ["mint", "bondingCurve", "associatedBondingCurve", "name", "symbol", "creator"]
-        for field in required_fields:
-            if field not in token_data or not token_data[field]:
-                logger.warning(f"Missing required field in token data: {field}")
-                return False
+        missing_field = next((field for field in REQUIRED_TOKEN_FIELDS if not token_data.get(field)), None)
+        if missing_field:
+            logger.warning(f"Missing required field in token data: {missing_field}")
+            return False
                 
         # Check for suspicious names
-        suspicious_patterns = ["scam", "rug", "fake", "steal", "ponzi"]
-        for pattern in suspicious_patterns:
-            if pattern.lower() in token_data["name"].lower() or pattern.lower() in token_data["symbol"].lower():
-                logger.warning(f"Suspicious pattern in token name/symbol: {pattern}")
-                return False
+        match = self._SUSPICIOUS_RE.search(token_data["name"]) or self._SUSPICIOUS_RE.search(token_data["symbol"])
+        if match:
+            logger.warning(f"Suspicious pattern in token name/symbol: {match.group(0).lower()}")
+            return False
                 
         return True
         
@@ -127,39 +130,40 @@ class RiskManager:
             logger.error("Trading strategy or transaction executor not set")
             return []
             
-        active_trades = self.trading_strategy.get_active_trades()
-        tokens_to_sell = []
+        # Snapshot the fields we need before awaiting, since active trades can change meanwhile
+        addresses, bonding_curves, purchase_prices = self.trading_strategy.get_active_trade_columns()
+        if not addresses:
+            return []
         
-        for token_address, trade_data in active_trades.items():
-            try:
-                # Get current price
-                current_price = await self.transaction_executor.fetch_token_price(trade_data["bondingCurve"])
-                
-                if current_price is None:
-                    logger.warning(f"Could not fetch current price for {token_address}")
-                    continue
-                    
-                purchase_price = trade_data["price"]
-                
-                # Calculate price change
-                price_change = (current_price - purchase_price) / purchase_price
-                
-                # Check stop loss
-                if price_change <= -self.stop_loss:
-                    logger.warning(f"Stop loss triggered for {token_address}: {price_change:.2%}")
-                    tokens_to_sell.append(token_address)
-                    continue
-                    
-                # Check take profit
-                if price_change >= self.take_profit:
-                    logger.info(f"Take profit triggered for {token_address}: {price_change:.2%}")
-                    tokens_to_sell.append(token_address)
-                    continue
-                    
-            except Exception as e:
-                logger.error(f"Error monitoring trade for {token_address}: {str(e)}")
-                
-        return tokens_to_sell
+        # Fetch all prices in batched RPCs, then evaluate each trade
+        try:
+            prices_by_curve = await self.transaction_executor.fetch_token_prices_batch(bonding_curves)
+        except Exception as e:
+            logger.error(f"Error fetching prices for active trades: {str(e)}")
+            return []
+            
+        # Failed fetches become NaN so the whole batch can be evaluated at once
+        prices = np.array(
+            [np.nan if price is None else price for price in (prices_by_curve.get(bc) for bc in bonding_curves)],
+            dtype=np.float64
+        )
+        missing = np.isnan(prices)
+        for i in np.flatnonzero(missing):
+            logger.warning(f"Could not fetch current price for {addresses[i]}")
+        valid = ~missing & (purchase_prices > 0)
+            
+        # Calculate price changes and stop loss / take profit triggers
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_changes = np.where(valid, (prices - purchase_prices) / purchase_prices, 0.0)
+        stop_loss_mask = valid & (price_changes <= -self.stop_loss)
+        take_profit_mask = valid & (price_changes >= self.take_profit)
+        
+        for i in np.flatnonzero(stop_loss_mask):
+            logger.warning(f"Stop loss triggered for {addresses[i]}: {price_changes[i]:.2%}")
+        for i in np.flatnonzero(take_profit_mask):
+            logger.info(f"Take profit triggered for {addresses[i]}: {price_changes[i]:.2%}")
+            
+        return [addresses[i] for i in np.flatnonzero(stop_loss_mask | take_profit_mask)]
         
     def emergency_stop_trading(self, reason):
         """
@@ -215,23 +219,30 @@ class RiskManager:
             logger.warning("Trading is currently stopped")
             return False
             
+        # Start the liquidity RPC now so it overlaps with the local checks below
+        liquidity_task = asyncio.create_task(self.check_token_liquidity(token_data.get("bondingCurve")))
+        await asyncio.sleep(0)  # Let the task send its request before the synchronous checks run
+        
         # Check portfolio diversification
         if not self.check_portfolio_diversification():
             logger.warning("Failed portfolio diversification check")
+            liquidity_task.cancel()
             return False
             
         # Validate token data
         if not self.validate_token_data(token_data):
             logger.warning("Failed token data validation")
+            liquidity_task.cancel()
             return False
             
         # Check token creator
         if not self.check_token_creator(token_data["creator"]):
             logger.warning("Failed token creator check")
+            liquidity_task.cancel()
             return False
             
         # Check token liquidity
-        if not await self.check_token_liquidity(token_data["bondingCurve"]):
+        if not await liquidity_task:
             logger.warning("Failed token liquidity check")
             return False
             
@@ -240,7 +251,10 @@ class RiskManager:
 
 # Example usage
 if __name__ == "__main__":
-    import asyncio
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     
     async def main():
         risk_manager = RiskManager()
@@ -7,28 +7,59 @@ import logging
 import time
 import asyncio
 from decimal import Decimal
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
+from collections import deque
+from dataclasses import dataclass
+import numpy as np
 from config.config import (
     DEFAULT_SLIPPAGE, MAX_ALLOCATION_PER_TOKEN, 
     STOP_LOSS_PERCENTAGE, TAKE_PROFIT_PERCENTAGE
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Nanoseconds in an hour, and the maximum time a position is held
+NS_PER_HOUR = 3600 * 1_000_000_000
+HOLD_LIMIT_NS = 24 * NS_PER_HOUR
+
+# Number of most recent trades kept in memory; performance figures use running totals
+MAX_TRADE_HISTORY = 100_000
+
+@dataclass(slots=True, frozen=True)
+class Trade:
+    """Record of a single buy or sell."""
+    token_address: str
+    token_name: str
+    token_symbol: str
+    bonding_curve: str
+    action: str
+    sol_amount: float
+    price: float
+    timestamp_ns: int  # time.monotonic_ns() when recorded, for hold-time checks
+    timestamp: float  # time.time() when recorded, for the trade history
+    profit_loss: float = 0.0
+
 class TradingStrategy:
     """Class to implement trading strategies for the fun bot."""
     
     def __init__(self, wallet_balance=0):
         """Initialize trading strategy with wallet balance."""
         self.wallet_balance = wallet_balance
+        self.reserved_balance = 0  # SOL set aside for buys still in flight
         self.active_trades = {}  # Track active trades
-        self.trade_history = []  # Track historical trades
+        self.trade_history = deque(maxlen=MAX_TRADE_HISTORY)  # Track recent historical trades
+        
+        # Running totals over completed (sell) trades, updated in record_sell
+        self._total_sells = 0
+        self._profitable_sells = 0
+        self._profit_loss_sum = 0.0
+        
+        # Column-oriented view of active trades for hot-path lookups; row i of each
+        # column belongs to self._trade_mints[i]
+        self._trade_index = {}  # Token mint -> row
+        self._trade_mints = []
+        self._trade_bonding_curves = []
+        self._trade_prices = np.empty(16, dtype=np.float64)
+        self._trade_timestamps = np.empty(16, dtype=np.int64)  # time.monotonic_ns() at purchase
         self.slippage = DEFAULT_SLIPPAGE
         self.max_allocation = MAX_ALLOCATION_PER_TOKEN
         self.stop_loss = STOP_LOSS_PERCENTAGE
@@ -39,6 +70,18 @@ class TradingStrategy:
         self.wallet_balance = balance
         logger.info(f"Wallet balance updated: {balance} SOL")
         
+    def reserve_balance(self, sol_amount):
+        """Set aside SOL for a buy in flight so other buys can't size against it."""
+        self.reserved_balance += sol_amount
+        
+    def release_balance(self, sol_amount):
+        """Release SOL reserved by reserve_balance once the buy has completed or failed."""
+        self.reserved_balance -= sol_amount
+        
+    def available_balance(self):
+        """Wallet balance not reserved by buys in flight."""
+        return self.wallet_balance - self.reserved_balance
+        
     def calculate_position_size(self, token_data, score):
         """
         Calculate position size based on token score and wallet balance.
@@ -47,8 +90,9 @@ class TradingStrategy:
         # Base allocation is proportional to score
         base_allocation = (score / 100) * self.max_allocation
         
-        # Calculate SOL amount based on wallet balance
-        sol_amount = self.wallet_balance * base_allocation
+        # Calculate SOL amount based on the unreserved wallet balance
+        available_balance = self.available_balance()
+        sol_amount = available_balance * base_allocation
         
         # Ensure minimum trade size
         min_trade = 0.01  # Minimum 0.01 SOL
@@ -56,7 +100,7 @@ class TradingStrategy:
             sol_amount = min_trade
             
         # Ensure maximum allocation is not exceeded
-        max_sol = self.wallet_balance * self.max_allocation
+        max_sol = available_balance * self.max_allocation
         if sol_amount > max_sol:
             sol_amount = max_sol
             
@@ -73,7 +117,7 @@ class TradingStrategy:
             return False, 0, f"Score too low: {score}"
             
         # Check if wallet has sufficient balance
-        if self.wallet_balance <= 0:
+        if self.available_balance() <= 0:
             return False, 0, "Insufficient wallet balance"
             
         # Calculate position size
@@ -90,7 +134,8 @@ class TradingStrategy:
         Determine if a token should be sold based on price movement and strategy rules.
         Returns a tuple of (should_sell, reason).
         """
-        if token_address not in self.active_trades:
+        row = self._trade_index.get(token_address)
+        if row is None:
             return False, "Token not in active trades"
             
         # Calculate price change percentage
@@ -105,29 +150,30 @@ class TradingStrategy:
             return True, f"Take profit triggered: {price_change:.2%}"
             
         # Time-based exit (hold for maximum of 24 hours)
-        purchase_time = self.active_trades[token_address]["timestamp"]
-        current_time = time.time()
-        hours_held = (current_time - purchase_time) / 3600
+        held_ns = time.monotonic_ns() - int(self._trade_timestamps[row])
         
-        if hours_held >= 24:
-            return True, f"Maximum hold time reached: {hours_held:.1f} hours"
+        if held_ns >= HOLD_LIMIT_NS:
+            return True, f"Maximum hold time reached: {held_ns / NS_PER_HOUR:.1f} hours"
             
         return False, "Holding position"
         
     def record_buy(self, token_data, sol_amount, price):
         """Record a buy transaction."""
-        trade = {
-            "token_address": token_data["mint"],
-            "token_name": token_data["name"],
-            "token_symbol": token_data["symbol"],
-            "action": "buy",
-            "sol_amount": sol_amount,
-            "price": price,
-            "timestamp": time.time()
-        }
+        trade = Trade(
+            token_address=token_data["mint"],
+            token_name=token_data["name"],
+            token_symbol=token_data["symbol"],
+            bonding_curve=token_data["bondingCurve"],
+            action="buy",
+            sol_amount=sol_amount,
+            price=price,
+            timestamp_ns=time.monotonic_ns(),
+            timestamp=time.time()
+        )
         
         # Add to active trades
         self.active_trades[token_data["mint"]] = trade
+        self._add_trade_row(trade)
         
         # Add to trade history
         self.trade_history.append(trade)
@@ -142,48 +188,88 @@ class TradingStrategy:
             
         buy_trade = self.active_trades[token_address]
         
-        trade = {
-            "token_address": token_address,
-            "token_name": buy_trade["token_name"],
-            "token_symbol": buy_trade["token_symbol"],
-            "action": "sell",
-            "sol_amount": sol_amount,
-            "price": price,
-            "timestamp": time.time(),
-            "profit_loss": (price - buy_trade["price"]) / buy_trade["price"]
-        }
+        trade = Trade(
+            token_address=token_address,
+            token_name=buy_trade.token_name,
+            token_symbol=buy_trade.token_symbol,
+            bonding_curve=buy_trade.bonding_curve,
+            action="sell",
+            sol_amount=sol_amount,
+            price=price,
+            timestamp_ns=time.monotonic_ns(),
+            timestamp=time.time(),
+            profit_loss=(price - buy_trade.price) / buy_trade.price
+        )
         
         # Remove from active trades
         del self.active_trades[token_address]
+        self._remove_trade_row(token_address)
         
         # Add to trade history
         self.trade_history.append(trade)
         
-        logger.info(f"Sell recorded: {sol_amount} SOL of {trade['token_symbol']} at {price} (P/L: {trade['profit_loss']:.2%})")
+        # Update running performance totals
+        self._total_sells += 1
+        self._profit_loss_sum += trade.profit_loss
+        if trade.profit_loss > 0:
+            self._profitable_sells += 1
+        
+        logger.info(f"Sell recorded: {sol_amount} SOL of {trade.token_symbol} at {price} (P/L: {trade.profit_loss:.2%})")
+        
+    def _add_trade_row(self, trade):
+        """Add or update an active trade's row in the column view."""
+        token_address = trade.token_address
+        row = self._trade_index.get(token_address)
+        if row is None:
+            row = len(self._trade_mints)
+            if row == len(self._trade_prices):
+                # Grow columns by doubling capacity
+                self._trade_prices = np.resize(self._trade_prices, 2 * row)
+                self._trade_timestamps = np.resize(self._trade_timestamps, 2 * row)
+            self._trade_index[token_address] = row
+            self._trade_mints.append(token_address)
+            self._trade_bonding_curves.append(trade.bonding_curve)
+        else:
+            self._trade_bonding_curves[row] = trade.bonding_curve
+            
+        self._trade_prices[row] = trade.price
+        self._trade_timestamps[row] = trade.timestamp_ns
+        
+    def _remove_trade_row(self, token_address):
+        """Remove an active trade's row by moving the last row into its place."""
+        row = self._trade_index.pop(token_address)
+        last = len(self._trade_mints) - 1
+        if row != last:
+            moved_address = self._trade_mints[last]
+            self._trade_mints[row] = moved_address
+            self._trade_bonding_curves[row] = self._trade_bonding_curves[last]
+            self._trade_prices[row] = self._trade_prices[last]
+            self._trade_timestamps[row] = self._trade_timestamps[last]
+            self._trade_index[moved_address] = row
+        self._trade_mints.pop()
+        self._trade_bonding_curves.pop()
+        
+    def get_active_trade_columns(self):
+        """
+        Get a snapshot of active trades as parallel columns.
+        Returns a tuple of (token_addresses, bonding_curves, purchase_prices), where
+        purchase_prices is a float64 NumPy array.
+        """
+        count = len(self._trade_mints)
+        return list(self._trade_mints), list(self._trade_bonding_curves), self._trade_prices[:count].copy()
         
     def get_active_trades(self):
         """Get list of active trades."""
         return self.active_trades
         
     def get_trade_history(self):
-        """Get trade history."""
+        """Get trade history (the most recent MAX_TRADE_HISTORY trades)."""
         return self.trade_history
         
     def calculate_performance(self):
         """Calculate overall trading performance."""
-        if not self.trade_history:
-            return {
-                "total_trades": 0,
-                "profitable_trades": 0,
-                "win_rate": 0,
-                "average_profit": 0,
-                "total_profit_loss": 0
-            }
-            
-        # Filter completed trades (buy and sell pairs)
-        completed_trades = [t for t in self.trade_history if t["action"] == "sell"]
-        
-        if not completed_trades:
+        # No completed trades yet (this also covers an empty history)
+        if self._total_sells == 0:
             return {
                 "total_trades": 0,
                 "profitable_trades": 0,
@@ -192,14 +278,14 @@ class TradingStrategy:
                 "total_profit_loss": 0
             }
             
-        # Calculate metrics
-        total_trades = len(completed_trades)
-        profitable_trades = sum(1 for t in completed_trades if t["profit_loss"] > 0)
-        win_rate = profitable_trades / total_trades if total_trades > 0 else 0
+        # Calculate metrics from running totals
+        total_trades = self._total_sells
+        profitable_trades = self._profitable_sells
+        win_rate = profitable_trades / total_trades
         
         # Calculate average and total profit/loss
-        total_profit_loss = sum(t["profit_loss"] for t in completed_trades)
-        average_profit = total_profit_loss / total_trades if total_trades > 0 else 0
+        total_profit_loss = self._profit_loss_sum
+        average_profit = total_profit_loss / total_trades
         
         return {
             "total_trades": total_trades,
@@ -211,6 +297,11 @@ class TradingStrategy:
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     # Example token data
     token_data = {
         "mint": "example_token_address",
@@ -5,28 +5,40 @@ Handles buying and selling tokens on fun platform.
 
 import logging
 import time
+import math
 import asyncio
-from solana.rpc.api import Client as SolanaClient
+from cachetools import TTLCache
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Processed
 import base58
-import sys
-sys.path.append('/home/ubuntu/fun_bot')
 from config.config import fun_PROGRAM_ID, SOLANA_RPC_URL, PRIORITY_FEE, WALLET_PRIVATE_KEY
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Maximum number of accounts the getMultipleAccounts RPC accepts per call
+MAX_ACCOUNTS_PER_REQUEST = 100
+
 class TransactionExecutor:
     """Class to execute buy and sell transactions on fun."""
     
     def __init__(self, solana_client=None):
         """Initialize transaction executor with Solana client."""
-        self.solana_client = solana_client or SolanaClient(SOLANA_RPC_URL)
+        # A client we create ourselves is closed by close(); a shared one is left to its owner.
+        # Request/response JSON is handled by solders (Rust) inside the client, not the json module.
+        self._owns_client = solana_client is None
+        self.solana_client = solana_client or AsyncClient(SOLANA_RPC_URL, commitment=Processed, timeout=10)
         self.wallet = self._load_wallet()
+        self.balance_cache_ttl = 0.5  # Seconds a fetched wallet balance stays valid
+        self._balance_cache = (0.0, -math.inf)  # (balance, monotonic fetch time)
+        self.price_cache_ttl = 0.5  # Seconds a fetched token price stays valid
+        self._price_cache = TTLCache(maxsize=4096, ttl=self.price_cache_ttl)
+        self._price_inflight = {}  # bonding curve address -> in-progress price fetch task
         
+    async def close(self):
+        """Close the Solana client if this executor created it."""
+        if self._owns_client:
+            await self.solana_client.close()
+            
     def _load_wallet(self):
         """Load wallet from private key."""
         try:
@@ -66,8 +78,28 @@ class TransactionExecutor:
     async def fetch_token_price(self, bonding_curve_address):
         """
         Fetch current token price from bonding curve account.
+        Prices are cached for price_cache_ttl seconds, and concurrent callers for the
+        same bonding curve share a single RPC.
         Returns price in SOL per token.
         """
+        cached_price = self._price_cache.get(bonding_curve_address)
+        if cached_price is not None:
+            return cached_price
+            
+        task = self._price_inflight.get(bonding_curve_address)
+        if task is None:
+            task = asyncio.create_task(self._fetch_token_price(bonding_curve_address))
+            self._price_inflight[bonding_curve_address] = task
+            task.add_done_callback(lambda _: self._price_inflight.pop(bonding_curve_address, None))
+            
+        # Shield so one caller being cancelled doesn't cancel the fetch for the others
+        price = await asyncio.shield(task)
+        if price is not None:
+            self._price_cache[bonding_curve_address] = price
+        return price
+    
+    async def _fetch_token_price(self, bonding_curve_address):
+        """Query token price from the bonding curve account. Returns None on failure."""
         try:
             # In a real implementation, this would get and parse bonding curve account data
             
@@ -80,9 +112,73 @@ class TransactionExecutor:
             logger.error(f"Error fetching token price: {str(e)}")
             return None
     
-    async def buy_token(self, token_data, sol_amount):
+    async def fetch_token_prices_batch(self, bonding_curve_addresses):
+        """
+        Fetch current prices for several bonding curves with as few RPCs as possible.
+        Cached prices are reused; the rest are fetched MAX_ACCOUNTS_PER_REQUEST at a time.
+        Returns a dict of bonding curve address -> price in SOL per token (None on failure).
+        """
+        prices = {}
+        missing = []
+        for address in dict.fromkeys(bonding_curve_addresses):
+            cached_price = self._price_cache.get(address)
+            if cached_price is not None:
+                prices[address] = cached_price
+            else:
+                missing.append(address)
+                
+        chunks = [
+            missing[i:i + MAX_ACCOUNTS_PER_REQUEST]
+            for i in range(0, len(missing), MAX_ACCOUNTS_PER_REQUEST)
+        ]
+        for chunk_prices in await asyncio.gather(*(self._fetch_token_prices_chunk(chunk) for chunk in chunks)):
+            for address, price in chunk_prices.items():
+                prices[address] = price
+                if price is not None:
+                    self._price_cache[address] = price
+                    
+        return prices
+    
+    async def _fetch_token_prices_chunk(self, bonding_curve_addresses):
+        """
+        Query prices for up to MAX_ACCOUNTS_PER_REQUEST bonding curves in one RPC.
+        Returns a dict of bonding curve address -> price (None on failure).
+        """
+        try:
+            # In a real implementation, this would call get_multiple_accounts(addresses, encoding="base64")
+            # and compute each price from the bonding curve's virtual SOL / virtual token reserves
+            
+            # For now, return a simulated price for each account
+            prices = {address: 0.0001 for address in bonding_curve_addresses}  # Example price in SOL per token
+            logger.info(f"Fetched {len(prices)} token prices from bonding curves")
+            return prices
+            
+        except Exception as e:
+            logger.error(f"Error fetching token prices: {str(e)}")
+            return {address: None for address in bonding_curve_addresses}
+    
+    async def get_recent_blockhash(self):
+        """
+        Fetch a fresh blockhash from the RPC.
+        Only used when the caller has no cached blockhash to pass in.
+        """
+        try:
+            response = await self.solana_client.get_latest_blockhash()
+            return response.value.blockhash
+        except Exception as e:
+            logger.error(f"Error fetching recent blockhash: {str(e)}")
+            return None
+    
+    async def _resolve_blockhash(self, recent_blockhash):
+        """Return recent_blockhash, or fetch a fresh one if it is None (None on failure)."""
+        if recent_blockhash is not None:
+            return recent_blockhash
+        return await self.get_recent_blockhash()
+    
+    async def buy_token(self, token_data, sol_amount, recent_blockhash=None):
         """
         Buy a token on fun.
+        If recent_blockhash is None, a fresh one is fetched from the RPC.
         Returns a tuple of (success, transaction_id, price).
         """
         try:
@@ -90,22 +186,31 @@ class TransactionExecutor:
                 logger.error("Wallet not initialized")
                 return False, None, None
                 
-            # Create associated token account if needed
-            account_created = await self.create_associated_token_account(token_data["mint"])
+            # Create the associated token account, get the current token price and,
+            # if none was passed in, a blockhash concurrently; the RPCs are independent
+            account_created, price, recent_blockhash = await asyncio.gather(
+                self.create_associated_token_account(token_data["mint"]),
+                self.fetch_token_price(token_data["bondingCurve"]),
+                self._resolve_blockhash(recent_blockhash)
+            )
             if not account_created:
                 logger.error(f"Failed to create associated token account for: {token_data['mint']}")
                 return False, None, None
-                
-            # Get current token price
-            price = await self.fetch_token_price(token_data["bondingCurve"])
+
             if price is None:
                 logger.error(f"Failed to fetch price for token: {token_data['mint']}")
                 return False, None, None
                 
+            if recent_blockhash is None:
+                logger.error(f"Failed to get a recent blockhash to buy: {token_data['mint']}")
+                return False, None, None
+                
             # In a real implementation, this would create and send a transaction
+            # signed against recent_blockhash
             
             # For now, simulate success
             tx_id = "simulated_transaction_id"
+            self._invalidate_balance_cache()
             logger.info(f"Buy transaction sent: {sol_amount} SOL of {token_data['symbol']} at {price} SOL per token")
             logger.info(f"Transaction ID: {tx_id}")
             
@@ -115,10 +220,11 @@ class TransactionExecutor:
             logger.error(f"Error buying token: {str(e)}")
             return False, None, None
     
-    async def sell_token(self, token_address, bonding_curve_address, token_amount=None):
+    async def sell_token(self, token_address, bonding_curve_address, token_amount=None, recent_blockhash=None):
         """
         Sell a token on fun.
         If token_amount is None, sells entire balance.
+        If recent_blockhash is None, a fresh one is fetched from the RPC.
         Returns a tuple of (success, transaction_id, price).
         """
         try:
@@ -126,22 +232,36 @@ class TransactionExecutor:
                 logger.error("Wallet not initialized")
                 return False, None, None
                 
-            # Get current token price
-            price = await self.fetch_token_price(bonding_curve_address)
-            if price is None:
+            # Get current token price and, if selling the entire amount, the token
+            # balance concurrently, along with a blockhash if none was passed in
+            if token_amount is None:
+                amount_request = self.get_token_balance(token_address)
+            else:
+                amount_request = asyncio.sleep(0, result=token_amount)
+            price, token_amount, recent_blockhash = await asyncio.gather(
+                self.fetch_token_price(bonding_curve_address),
+                amount_request,
+                self._resolve_blockhash(recent_blockhash),
+                return_exceptions=True
+            )
+            if isinstance(price, BaseException) or price is None:
                 logger.error(f"Failed to fetch price for token: {token_address}")
                 return False, None, None
                 
-            # Get token balance if selling entire amount
-            if token_amount is None:
-                # This would get the token balance from the associated token account
-                # For now, use a simulated amount
-                token_amount = 1000
+            if isinstance(token_amount, BaseException) or not token_amount:
+                logger.error(f"Failed to get token amount to sell for: {token_address}")
+                return False, None, None
+                
+            if isinstance(recent_blockhash, BaseException) or recent_blockhash is None:
+                logger.error(f"Failed to get a recent blockhash to sell: {token_address}")
+                return False, None, None
                 
             # In a real implementation, this would create and send a transaction
+            # signed against recent_blockhash
             
             # For now, simulate success
             tx_id = "simulated_transaction_id"
+            self._invalidate_balance_cache()
             sol_amount = token_amount * price
             logger.info(f"Sell transaction sent: {token_amount} tokens of {token_address} at {price} SOL per token")
             logger.info(f"Expected return: {sol_amount} SOL")
@@ -154,11 +274,32 @@ class TransactionExecutor:
             return False, None, None
     
     async def get_wallet_balance(self):
-        """Get current wallet SOL balance."""
+        """
+        Get current wallet SOL balance.
+        Results are cached for balance_cache_ttl seconds to avoid repeated RPCs.
+        """
+        now = time.monotonic()
+        balance, fetched_at = self._balance_cache
+        if now - fetched_at < self.balance_cache_ttl:
+            return balance
+            
+        balance = await self._fetch_wallet_balance()
+        if balance is None:
+            return 0
+            
+        self._balance_cache = (balance, now)
+        return balance
+    
+    def _invalidate_balance_cache(self):
+        """Force the next get_wallet_balance call to query the RPC."""
+        self._balance_cache = (self._balance_cache[0], -math.inf)
+    
+    async def _fetch_wallet_balance(self):
+        """Query wallet SOL balance from the RPC. Returns None on failure."""
         try:
             if not self.wallet:
                 logger.error("Wallet not initialized")
-                return 0
+                return None
                 
             # In a real implementation, this would query the actual balance
             
@@ -170,7 +311,7 @@ class TransactionExecutor:
             
         except Exception as e:
             logger.error(f"Error getting wallet balance: {str(e)}")
-            return 0
+            return None
     
     async def get_token_balance(self, token_mint):
         """Get token balance for a specific mint."""
@@ -193,7 +334,10 @@ class TransactionExecutor:
 
 # Example usage
 if __name__ == "__main__":
-    import asyncio
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
     
     async def main():
         executor = TransactionExecutor()
@@ -220,5 +364,7 @@ if __name__ == "__main__":
         # Get wallet balance
         balance = await executor.get_wallet_balance()
         print(f"Wallet balance: {balance} SOL")
+        
+        await executor.close()
     
     asyncio.run(main())
@@ -23,7 +23,7 @@ fi
 
 # Start the bot
 echo "Starting fun trading bot..."
-python src/bot_controller.py
+python -m src.bot_controller
 
 # Deactivate virtual environment on exit
 deactivate
@@ -4,7 +4,7 @@
 # This script finds and stops the running bot process
 
 # Find the PID of the running bot
-BOT_PID=$(pgrep -f "python src/bot_controller.py")
+BOT_PID=$(pgrep -f "python -m src.bot_controller")
 
 if [ -z "$BOT_PID" ]; then
     echo "No running fun trading bot found."